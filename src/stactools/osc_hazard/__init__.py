@@ -1,13 +1,27 @@
+from typing import Any
+
 import stactools.core
 from stactools.cli.registry import Registry
-from stactools.osc_hazard.stac import create_collection, create_item
-from stactools.osc_hazard.cubify import cubify
 
 __all__ = ["create_collection", "create_item", "cubify"]
 
 stactools.core.use_fsspec()
 
 
+def __getattr__(name: str) -> Any:
+    # the public functions pull in xarray, zarr, xstac and hazard, so they are
+    # only imported on first access to keep command line startup fast
+    if name in ("create_collection", "create_item"):
+        from stactools.osc_hazard import stac
+
+        return getattr(stac, name)
+    if name == "cubify":
+        from stactools.osc_hazard.cubes import cubify
+
+        return cubify
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 def register_plugin(registry: Registry) -> None:
     from stactools.osc_hazard import commands
 
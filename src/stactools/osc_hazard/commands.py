@@ -1,45 +1,97 @@
 import logging
+import os.path
+import re
 from pathlib import Path
 from os import PathLike
+from typing import Iterable, Optional, TextIO
 
 import click
 from click import Command, Group
-import xarray as xr
 
-from stactools.osc_hazard.constants import SUPPORTED_INDICATORS, XARRAY_OPEN_KWARGS
-from stactools.osc_hazard import cubify, stac
+from stactools.osc_hazard.constants import (
+    DEFAULT_TARGET_CHUNK_MB,
+    SUPPORTED_INDICATORS,
+    XARRAY_OPEN_KWARGS,
+)
 
 logger = logging.getLogger(__name__)
 
+_GLOB_RE = re.compile(r"[*?[]")
+
 
 def cubify_invocation(
-    store_path: PathLike,
-    output_dir: PathLike,
+    store_path: Path,
+    output_dir: Path,
     indicator_name: str,
     split_years: bool = True,
+    target_chunk_mb: float = DEFAULT_TARGET_CHUNK_MB,
+    quantize: bool = True,
 ):
+    from stactools.osc_hazard.cubes import cubify
+
     generated_files = cubify(
-        store_path=Path(store_path),
-        output_dir=Path(output_dir),
+        store_path=store_path,
+        output_dir=output_dir,
         indicator_name=indicator_name,
         split_years=split_years,
+        target_chunk_mb=target_chunk_mb,
+        quantize=quantize,
     )
     file_list = "\n".join(map(str, generated_files.values()))
     click.echo(f"Generated the following data cube files:\n{file_list}")
 
 
-def collection_invocation(sources: str, destination: PathLike):
-    with xr.open_mfdataset(sources, **XARRAY_OPEN_KWARGS) as ds:
+def collection_invocation(sources: tuple[str, ...], destination: PathLike):
+    import xarray as xr
+
+    from stactools.osc_hazard import stac
+
+    if len(sources) != 1:
+        open_ds = xr.open_mfdataset(sources, **XARRAY_OPEN_KWARGS)
+    elif _GLOB_RE.search(sources[0]):
+        # xarray only expands a pattern passed as a string
+        open_ds = xr.open_mfdataset(sources[0], **XARRAY_OPEN_KWARGS)
+    else:
+        # a single data cube does not need to be combined
+        open_ds = xr.open_dataset(sources[0], **XARRAY_OPEN_KWARGS)
+    with open_ds as ds:
         collection = stac.create_collection(ds)
     collection.save_object(dest_href=destination)
 
 
 def item_invocation(source: str, destination: PathLike):
+    import xarray as xr
+
+    from stactools.osc_hazard import stac
+
     with xr.open_dataset(source, **XARRAY_OPEN_KWARGS) as ds:
         item = stac.create_item(ds, href=source)
     item.save_object(dest_href=destination)
 
 
+def items_invocation(sources: Iterable[str], destination: str):
+    import xarray as xr
+
+    from stactools.osc_hazard import stac
+
+    # create all items before writing any, so that duplicate ids, which would
+    # overwrite each other's files, leave the destination untouched
+    items = {}
+    item_sources = {}
+    for source in sources:
+        with xr.open_dataset(source, **XARRAY_OPEN_KWARGS) as ds:
+            item = stac.create_item(ds, href=source)
+        if item.id in items:
+            raise ValueError(
+                f"Sources {item_sources[item.id]} and {source} both create an Item "
+                f"with id {item.id}"
+            )
+        items[item.id] = item
+        item_sources[item.id] = source
+    for item_id, item in items.items():
+        item.save_object(dest_href=os.path.join(destination, f"{item_id}.json"))
+
+
 def create_oschazard_command(cli: Group) -> Command:
     """Creates the stactools-osc-hazard command line utility."""
 
@@ -55,11 +107,12 @@ def create_oschazard_command(cli: Group) -> Command:
         short_help="Turn OS-Climate Hazard Zarr into data cube Zarr",
     )
     @click.argument(
-        "store_path", type=click.Path(exists=True, file_okay=False, dir_okay=True)
+        "store_path",
+        type=click.Path(exists=True, file_okay=False, dir_okay=True, path_type=Path),
     )
     @click.argument(
         "output_dir",
-        type=click.Path(file_okay=False, dir_okay=True),
+        type=click.Path(file_okay=False, dir_okay=True, path_type=Path),
     )
     @click.option(
         "--indicator-name",
@@ -74,17 +127,34 @@ def create_oschazard_command(cli: Group) -> Command:
         show_default=True,
         help="Split output zarr cubes by year",
     )
+    @click.option(
+        "--target-chunk-mb",
+        type=click.FloatRange(min=0, min_open=True),
+        default=DEFAULT_TARGET_CHUNK_MB,
+        show_default=True,
+        help="Approximate size of the output zarr chunks in megabytes",
+    )
+    @click.option(
+        "--quantize/--no-quantize",
+        default=True,
+        show_default=True,
+        help="Store indicator values as scaled 16-bit integers",
+    )
     def cubify_command(
-        store_path: PathLike,
-        output_dir: PathLike,
+        store_path: Path,
+        output_dir: Path,
         indicator_name: str,
         split_years: bool,
+        target_chunk_mb: float,
+        quantize: bool,
     ):
         cubify_invocation(
             store_path,
             output_dir,
             indicator_name=indicator_name,
             split_years=split_years,
+            target_chunk_mb=target_chunk_mb,
+            quantize=quantize,
         )
 
     @oschazard.command(
@@ -93,7 +163,7 @@ def create_oschazard_command(cli: Group) -> Command:
     )
     @click.argument("sources", nargs=-1)
     @click.argument("destination")
-    def create_collection_command(sources: str, destination: str) -> None:
+    def create_collection_command(sources: tuple[str, ...], destination: str) -> None:
         """Creates a STAC Collection
 
         Args:
@@ -114,4 +184,28 @@ def create_oschazard_command(cli: Group) -> Command:
         """
         item_invocation(source, destination)
 
+    @oschazard.command("create-items", short_help="Create STAC items in bulk")
+    @click.argument("sources", nargs=-1)
+    @click.argument("destination")
+    @click.option(
+        "--items-from",
+        type=click.File("r"),
+        help="File with additional source HREFs, one per line ('-' for stdin)",
+    )
+    def create_items_command(
+        sources: tuple[str, ...], destination: str, items_from: Optional[TextIO]
+    ) -> None:
+        """Creates a STAC Item for each source in a single process
+
+        Args:
+            sources: HREFs of the Assets associated with the Items
+            destination: An HREF for the directory the Items are written to,
+                as <item id>.json
+        """
+        if items_from is not None:
+            sources += tuple(line.strip() for line in items_from if line.strip())
+        if not sources:
+            raise click.UsageError("No sources given")
+        items_invocation(sources, destination)
+
     return oschazard
@@ -57,6 +57,13 @@ DESCRIPTIONS = {
 
 KEYWORDS = ["OS-Climate", "Climate Hazards"]
 
+# scale factors used to pack indicator values into int16, chosen so that the
+# largest plausible value fits the int16 range: days_tas_above is at most 366
+# and degree_days reach about 23,000 for hot locations and high thresholds
+SCALE_FACTORS = {"days_tas_above": 0.02, "degree_days": 1.0}
+
 SUPPORTED_INDICATORS = list(ATTRS)
 
-XARRAY_OPEN_KWARGS = dict(engine="zarr", consolidated=True)
+DEFAULT_TARGET_CHUNK_MB = 50
+
+XARRAY_OPEN_KWARGS = dict(engine="zarr", consolidated=True, chunks={})
@@ -0,0 +1,323 @@
+import datetime
+import logging
+import math
+import re
+import shutil
+from collections import defaultdict
+from pathlib import Path
+from typing import Iterable, NamedTuple
+
+import dask
+import dask.array
+import numpy as np
+import xarray as xr
+import zarr
+
+from .constants import ATTRS, DEFAULT_TARGET_CHUNK_MB, SCALE_FACTORS
+
+INDICATOR_NAME = "indicator"
+
+QUANTIZED_DTYPE = np.dtype("int16")
+
+_NESTED_KEY_RE = re.compile(rf".*_\d{{4}}/{INDICATOR_NAME}$")
+_FLAT_KEY_RE = re.compile(r".*_\d{4}$")
+_INDEX_RE = re.compile(r".*_([0-9]+\.?[0-9]+)c_([a-zA-Z0-9-]+)_([a-zA-Z0-9]+)_(\d+).*")
+
+logger = logging.getLogger(__name__)
+
+
+class _Index(NamedTuple):
+    temperature: float
+    gcm: str
+    scenario: str
+    time: datetime.datetime
+
+
+def _parse_index_name(key: str) -> _Index:
+    match = _INDEX_RE.match(key)
+    if match is None:
+        raise ValueError(f"Unable to match string '{key}'")
+    temperature, gcm, scenario, year = match.groups()
+    return _Index(
+        temperature=float(temperature),
+        gcm=gcm,
+        scenario=scenario,
+        time=datetime.datetime(int(year), 1, 1),
+    )
+
+
+def _open_group(store: zarr.DirectoryStore) -> zarr.Group:
+    try:
+        return zarr.open_consolidated(store, mode="r")
+    except KeyError:
+        logger.warning(
+            f"Store at {store.dir_path()} has no consolidated metadata, "
+            "falling back to listing the store."
+        )
+        return zarr.open_group(store, mode="r")
+
+
+def _walk_array_keys(group: zarr.Group):
+    # with consolidated metadata the hierarchy is walked in memory
+    for _, array in group.arrays():
+        yield array.path
+    for _, subgroup in group.groups():
+        yield from _walk_array_keys(subgroup)
+
+
+def _index_arrays(root: zarr.Group):
+    nested_keys, flat_keys = [], []
+    for key in _walk_array_keys(root):
+        if _NESTED_KEY_RE.match(key):
+            nested_keys.append(key)
+        elif _FLAT_KEY_RE.match(key):
+            flat_keys.append(key)
+
+    # fall back to assuming flat array structure
+    keys = nested_keys or flat_keys
+    if not keys:
+        all_keys = list(_walk_array_keys(root))
+        raise RuntimeError(
+            f"Store at {root.chunk_store.dir_path()} does not contain any matching arrays. Found only {all_keys}."
+        )
+    return {key: _parse_index_name(key) for key in keys}
+
+
+def _indexes_to_coords(indexes: Iterable[_Index]):
+    coords = {key: set() for key in _Index._fields}
+    for index in indexes:
+        for values, value in zip(coords.values(), index):
+            values.add(value)
+
+    return {key: sorted(values) for key, values in coords.items()}
+
+
+def _stack_source_arrays(root: zarr.Group, indexes: dict, coords: dict):
+    index_coords = [coords[name] for name in _Index._fields]
+    grid_shape = tuple(len(values) for values in index_coords)
+    positions = [
+        {value: i for i, value in enumerate(values)} for values in index_coords
+    ]
+
+    # lazily place every source array at its flat position in the index grid,
+    # reading it in its on-disk chunks
+    blocks = [None] * int(np.prod(grid_shape))
+    for key, index in indexes.items():
+        multi_index = tuple(lookup[value] for lookup, value in zip(positions, index))
+        array = root[key]
+        blocks[np.ravel_multi_index(multi_index, grid_shape)] = dask.array.from_zarr(
+            array, chunks=array.chunks
+        )[0]
+
+    # index combinations missing from the source are filled with zeros, sharing
+    # a single lazy block; a complete grid needs no fill at all
+    if len(indexes) < len(blocks):
+        template = next(block for block in blocks if block is not None)
+        zeros = dask.array.zeros_like(template)
+        blocks = [zeros if block is None else block for block in blocks]
+
+    return dask.array.stack(blocks).reshape(grid_shape + blocks[0].shape)
+
+
+def _target_chunks(shape: tuple, itemsize: int, target_chunk_mb: float) -> tuple:
+    # Each chunk spans all (temperature, gcm, scenario, time) values, so reading
+    # the full set of indicator values at a location touches a single chunk,
+    # and is tiled spatially into squares sized to hold roughly target_chunk_mb.
+    # Chunks in the tens of megabytes keep the number of chunk files, and the
+    # metadata cost of listing them, low while still being cheap to fetch
+    # whole from remote storage.
+    n_index = len(_Index._fields)
+    index_shape = tuple(shape[:n_index])
+    pixel_bytes = int(np.prod(index_shape)) * itemsize
+    tile = int(math.sqrt(target_chunk_mb * 2**20 / pixel_bytes))
+    return index_shape + tuple(max(1, min(tile, size)) for size in shape[n_index:])
+
+
+def _quantized_encoding(indicator_name: str) -> dict:
+    # CF-style packing of the indicator values, which have a small bounded
+    # range, into scaled integers, with the smallest integer reserved for NaN
+    return {
+        "dtype": QUANTIZED_DTYPE,
+        "scale_factor": np.float32(SCALE_FACTORS[indicator_name]),
+        "add_offset": np.float32(0),
+        "_FillValue": np.iinfo(QUANTIZED_DTYPE).min,
+        "compressor": zarr.Blosc(cname="zstd", clevel=5, shuffle=zarr.Blosc.SHUFFLE),
+    }
+
+
+def _check_quantized_range(block: np.ndarray, indicator_name: str) -> np.ndarray:
+    # values outside the packed range would silently wrap around; checked per
+    # block so that the write fails at the first block that cannot be packed
+    scale_factor = SCALE_FACTORS[indicator_name]
+    limits = np.iinfo(QUANTIZED_DTYPE)
+    values = block[~np.isnan(block)]
+    if values.size and not (
+        (limits.min + 1) * scale_factor <= values.min()
+        and values.max() <= limits.max * scale_factor
+    ):
+        raise ValueError(
+            f"Values of {indicator_name} range from {values.min()} to "
+            f"{values.max()}, which cannot be packed into {QUANTIZED_DTYPE} with a "
+            f"scale factor of {scale_factor}; write the cube without quantization "
+            "instead"
+        )
+    return block
+
+
+def _create_cube_array(
+    data: dask.array.Array,
+    coords: dict,
+    sample_array: xr.DataArray,
+    indicator_name: str,
+):
+    indicator_attrs = ATTRS[indicator_name]
+    attrs = sample_array.attrs.copy()
+    attrs.update(indicator_attrs[indicator_name])
+    da = xr.DataArray(
+        data,
+        coords=coords,
+        attrs=attrs,
+        name=indicator_name,
+    )
+
+    # set coordinate variable attributes
+    sample_variables = sample_array.coords.variables
+    for name, variable in da.coords.variables.items():
+        if name in indicator_attrs:
+            variable.attrs = indicator_attrs[name]
+        elif name in sample_variables:
+            variable.attrs = sample_variables[name].attrs.copy()
+
+    return da
+
+
+def _build_zarr_cube(
+    root: zarr.Group,
+    indexes: dict,
+    sample_array: xr.DataArray,
+    indicator_name: str,
+    output_path: Path,
+    target_chunk_mb: float,
+    quantize: bool,
+):
+    # create Xarray coords, augmented with those present in sample array
+    coords = _indexes_to_coords(indexes.values())
+    coords.update({key: sample_array.coords[key].values for key in sample_array.dims})
+
+    # stack the source arrays into a single lazy array with attributes and all
+    da = _create_cube_array(
+        data=_stack_source_arrays(root, indexes=indexes, coords=coords),
+        coords=coords,
+        sample_array=sample_array,
+        indicator_name=indicator_name,
+    )
+
+    encoding = {indicator_name: {}}
+    if quantize:
+        encoding[indicator_name].update(_quantized_encoding(indicator_name))
+    itemsize = encoding[indicator_name].get("dtype", da.dtype).itemsize
+
+    # rechunk from the source layout to the target layout
+    chunks = _target_chunks(da.shape, itemsize, target_chunk_mb)
+    da = da.chunk(dict(zip(da.dims, chunks)))
+    encoding[indicator_name]["chunks"] = chunks
+    if quantize:
+        da = da.copy(
+            data=da.data.map_blocks(
+                _check_quantized_range, indicator_name=indicator_name, dtype=da.dtype
+            )
+        )
+
+    # write the metadata to zarr, overwriting any existing file, and return
+    # the delayed write of the data; consolidated metadata is required by the
+    # STAC commands which open the cubes
+    ds = da.to_dataset()
+    return ds.to_zarr(
+        output_path, mode="w", consolidated=True, encoding=encoding, compute=False
+    )
+
+
+def build_yearly_zarr_cubes(
+    root: zarr.Group,
+    indexes_grouped: dict,
+    indicator_name: str,
+    output_dir: Path,
+    target_chunk_mb: float = DEFAULT_TARGET_CHUNK_MB,
+    quantize: bool = True,
+):
+    from hazard.sources.osc_zarr import OscZarr
+
+    target = OscZarr(store=root.chunk_store)
+
+    def _read_source_array(target: OscZarr, key: str):
+        da = target.read(key)
+        return da.isel(index=0)
+
+    # the spatial coordinates and attributes are the same for every source
+    # array, so they are read once from a sample
+    sample_key = next(iter(next(iter(indexes_grouped.values()))))
+    sample_array = _read_source_array(target, key=sample_key)
+
+    # yearly files are independent of each other, so they are written in a
+    # single compute, which lets one scheduler bound the threads and memory;
+    # if any year fails, all files are removed rather than leaving some years
+    output_paths = {}
+    writes = []
+    try:
+        for year, indexes in indexes_grouped.items():
+            # generate one file per year
+            output_paths[year] = output_dir / f"{indicator_name}_{year:04d}.zarr"
+            writes.append(
+                _build_zarr_cube(
+                    root,
+                    indexes=indexes,
+                    sample_array=sample_array,
+                    indicator_name=indicator_name,
+                    output_path=output_paths[year],
+                    target_chunk_mb=target_chunk_mb,
+                    quantize=quantize,
+                )
+            )
+        dask.compute(*writes)
+    except Exception:
+        for output_path in output_paths.values():
+            shutil.rmtree(output_path, ignore_errors=True)
+        raise
+
+    return output_paths
+
+
+def cubify(
+    store_path: Path,
+    indicator_name: str,
+    output_dir: Path,
+    split_years: bool = True,
+    target_chunk_mb: float = DEFAULT_TARGET_CHUNK_MB,
+    quantize: bool = True,
+):
+    # open OS-Climate Zarr in the directory that contains the arrays
+    root = _open_group(zarr.DirectoryStore(store_path))
+
+    # index the contents
+    indexes = _index_arrays(root)
+
+    # group by year
+    if split_years:
+        indexes_grouped = defaultdict(dict)
+        for name, index in indexes.items():
+            indexes_grouped[index.time.year][name] = index
+    else:
+        first_year = next(iter(indexes.values())).time.year
+        indexes_grouped = {first_year: indexes}
+
+    # copy source data into multidimensional zarr in yearly files
+    output_paths = build_yearly_zarr_cubes(
+        root=root,
+        indexes_grouped=indexes_grouped,
+        indicator_name=indicator_name,
+        output_dir=output_dir,
+        target_chunk_mb=target_chunk_mb,
+        quantize=quantize,
+    )
+
+    return output_paths
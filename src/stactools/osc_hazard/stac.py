@@ -1,4 +1,7 @@
+from typing import Union
 
+import numpy as np
+import pandas as pd
 import shapely
 import xarray as xr
 import xstac
@@ -15,6 +18,7 @@ from pystac import (
     SpatialExtent,
     TemporalExtent,
 )
+from pystac.extensions.datacube import DatacubeExtension, Dimension, Variable
 
 try:
     from pystac import Render, RenderExtension
@@ -30,19 +34,112 @@ from stactools.osc_hazard.constants import (
     XARRAY_OPEN_KWARGS,
 )
 
+REFERENCE_SYSTEM = "epsg:4326"
 
-def _get_bbox(da: list[float]):
-    return list(
-        map(
-            float,
-            [
-                da["longitude"].min(),
-                da["latitude"].min(),
-                da["longitude"].max(),
-                da["latitude"].max(),
+# dimensions of the data cubes written by cubify
+CUBE_DIMENSIONS = {"temperature", "gcm", "scenario", "time", "latitude", "longitude"}
+
+
+def _get_extent(ds: xr.Dataset, name: str) -> tuple[float, float]:
+    index = ds.indexes[name]
+    if not (index.is_monotonic_increasing or index.is_monotonic_decreasing):
+        raise ValueError(f"Coordinate '{name}' is not monotonic.")
+    first, last = index[[0, -1]]
+    return float(min(first, last)), float(max(first, last))
+
+
+def _get_bbox(ds: xr.Dataset) -> list[float]:
+    # coordinates are monotonic, so their extremes are at either end
+    lon_min, lon_max = _get_extent(ds, "longitude")
+    lat_min, lat_max = _get_extent(ds, "latitude")
+    return [lon_min, lat_min, lon_max, lat_max]
+
+
+def _get_step(index: pd.Index):
+    delta = np.diff(index.values)
+    if len(delta) > 1 and (delta[0] == delta[1:]).all():
+        return delta[0]
+    return None
+
+
+def _build_cube_dimensions(ds: xr.Dataset) -> dict[str, Dimension]:
+    time = ds.indexes["time"]
+    step = _get_step(time)
+    dimensions = {
+        "time": {
+            "type": "temporal",
+            "description": ds["time"].attrs.get("long_name"),
+            "extent": [
+                time.min().strftime("%Y-%m-%dT%H:%M:%SZ"),
+                time.max().strftime("%Y-%m-%dT%H:%M:%SZ"),
             ],
+            "step": None if step is None else pd.Timedelta(step).isoformat(),
+        }
+    }
+    for name, axis in [("longitude", "x"), ("latitude", "y")]:
+        step = _get_step(ds.indexes[name])
+        dimensions[name] = {
+            "type": "spatial",
+            "axis": axis,
+            "description": ds[name].attrs.get("long_name"),
+            "extent": list(_get_extent(ds, name)),
+            "step": None if step is None else step.item(),
+            "reference_system": REFERENCE_SYSTEM,
+        }
+
+    return {
+        name: Dimension.from_dict({k: v for k, v in d.items() if v is not None})
+        for name, d in dimensions.items()
+    }
+
+
+def _build_cube_variables(ds: xr.Dataset) -> dict[str, Variable]:
+    variables = {}
+    for name, variable in ds.variables.items():
+        if name in ds.dims:
+            continue
+        attrs = variable.attrs
+        properties = {
+            "type": "auxiliary" if name in ds.coords else "data",
+            "description": attrs.get("description") or attrs.get("long_name"),
+            "dimensions": list(variable.dims),
+            "unit": attrs.get("units"),
+            "attrs": dict(attrs),
+            "shape": list(variable.shape),
+            "chunks": list(variable.data.chunksize) if variable.chunks else None,
+        }
+        variables[name] = Variable(
+            {k: v for k, v in properties.items() if v is not None}
         )
+    return variables
+
+
+def _add_datacube_extension(
+    stac_object: Union[Item, Collection], ds: xr.Dataset
+) -> Union[Item, Collection]:
+    if set(ds.dims) != CUBE_DIMENSIONS:
+        # not one of our cubes, let xstac work out the dimensions
+        return xstac.xarray_to_stac(
+            ds,
+            stac_object,
+            reference_system=REFERENCE_SYSTEM,
+            temporal_dimension="time",
+            x_dimension="longitude",
+            y_dimension="latitude",
+        )
+
+    # the layout of our cubes is known, so the extension is built directly from
+    # the in-memory coordinate indexes
+    dimensions = _build_cube_dimensions(ds)
+    DatacubeExtension.ext(stac_object, add_if_missing=True).apply(
+        dimensions=dimensions, variables=_build_cube_variables(ds)
     )
+    if isinstance(stac_object, Item):
+        start, end = dimensions["time"].extent
+        stac_object.properties.setdefault("start_datetime", start)
+        stac_object.properties.setdefault("end_datetime", end)
+
+    return stac_object
 
 
 def create_collection(ds: xr.Dataset) -> Collection:
@@ -129,14 +226,7 @@ def create_collection(ds: xr.Dataset) -> Collection:
         RenderExtension.ext(collection).apply(renders)
 
     # add data cube extension
-    collection = xstac.xarray_to_stac(
-        ds,
-        collection,
-        reference_system="epsg:4326",
-        temporal_dimension="time",
-        x_dimension="longitude",
-        y_dimension="latitude",
-    )
+    collection = _add_datacube_extension(collection, ds)
 
     return collection
 
@@ -196,21 +286,15 @@ def create_item(ds: xr.Dataset, href: str) -> Item:
     )
 
     # add data cube extension
-    item = xstac.xarray_to_stac(
-        ds,
-        item,
-        reference_system="epsg:4326",
-        temporal_dimension="time",
-        x_dimension="longitude",
-        y_dimension="latitude",
-    )
+    item = _add_datacube_extension(item, ds)
 
     # additional dimensions not implemented in xstac
     for name in ["temperature", "gcm", "scenario"]:
+        coord = ds[name]
         item.properties["cube:dimensions"][name] = {
             "type": "other",
-            "description": ds[name].attrs["long_name"],
-            "values": list(map(str, ds[name].values)),
+            "description": coord.attrs["long_name"],
+            "values": coord.values.astype("U").tolist(),
         }
 
     return item
@@ -1,10 +1,14 @@
+import datetime
 from pathlib import Path
 
+import numpy as np
+import xarray as xr
 from click import Group
 from click.testing import CliRunner
 from pystac import Collection, Item
 
 from stactools.osc_hazard.commands import create_oschazard_command
+from stactools.osc_hazard.constants import ATTRS
 
 from . import test_data
 
@@ -35,3 +39,62 @@ def test_create_item(tmp_path: Path) -> None:
     assert result.exit_code == 0, "\n{}".format(result.output)
     item = Item.from_file(path)
     item.validate()
+
+
+def _write_cube(path: Path, year: int) -> str:
+    coords = {
+        "temperature": [25.0, 30.0],
+        "gcm": ["ACCESS-CM2"],
+        "scenario": ["ssp585"],
+        "time": [datetime.datetime(year, 1, 1)],
+        "latitude": [51.0, 50.5, 50.0],
+        "longitude": [0.0, 0.5],
+    }
+    ds = xr.Dataset(
+        {
+            "degree_days": (
+                list(coords),
+                np.zeros([len(values) for values in coords.values()]),
+            )
+        },
+        coords=coords,
+    )
+    for name, attrs in ATTRS["degree_days"].items():
+        ds[name].attrs = dict(attrs)
+    href = str(path / f"degree_days_{year}.zarr")
+    ds.to_zarr(href, consolidated=True)
+    return href
+
+
+def test_create_items(tmp_path: Path) -> None:
+    # Smoke test for the command line create-items command
+    sources = [_write_cube(tmp_path, year) for year in [2030, 2040, 2050]]
+    items_from = "\n".join(sources[1:]) + "\n"
+    destination = tmp_path / "items"
+    runner = CliRunner()
+    result = runner.invoke(
+        command,
+        ["create-items", sources[0], str(destination), "--items-from", "-"],
+        input=items_from,
+    )
+    assert result.exit_code == 0, "\n{}".format(result.output)
+    for year in [2030, 2040, 2050]:
+        item = Item.from_file(str(destination / f"degree_days_{year}.json"))
+        assert item.id == f"degree_days_{year}"
+
+
+def test_create_items_duplicate_id(tmp_path: Path) -> None:
+    sources = [_write_cube(tmp_path / name, 2030) for name in ["a", "b"]]
+    destination = tmp_path / "items"
+    runner = CliRunner()
+    result = runner.invoke(command, ["create-items", *sources, str(destination)])
+    assert isinstance(result.exception, ValueError)
+    assert "degree_days_2030" in str(result.exception)
+    assert not destination.exists()
+
+
+def test_create_items_no_sources(tmp_path: Path) -> None:
+    runner = CliRunner()
+    result = runner.invoke(command, ["create-items", str(tmp_path / "items")])
+    assert result.exit_code == 2
+    assert "No sources given" in result.output
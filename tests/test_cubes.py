@@ -0,0 +1,189 @@
+import datetime
+import itertools
+from pathlib import Path
+
+import numpy as np
+import pytest
+import xarray as xr
+import zarr
+
+from stactools.osc_hazard.constants import SCALE_FACTORS
+from stactools.osc_hazard.cubes import (
+    _indexes_to_coords,
+    _parse_index_name,
+    _target_chunks,
+    cubify,
+)
+
+TEMPERATURES = ["25", "30.5"]
+GCMS = ["ACCESS-CM2", "NorESM2-MM"]
+SCENARIOS = ["ssp126", "ssp585"]
+YEARS = [2030, 2050]
+MISSING = ("25", "NorESM2-MM", "ssp126", 2050)
+
+
+def _write_source_store(path: Path) -> dict:
+    # small OS-Climate hazard store with one index combination missing, and one
+    # missing pixel in each array
+    root = zarr.open_group(zarr.DirectoryStore(str(path)), mode="w")
+    rng = np.random.default_rng(0)
+    arrays = {}
+    for combination in itertools.product(TEMPERATURES, GCMS, SCENARIOS, YEARS):
+        if combination == MISSING:
+            continue
+        temperature, gcm, scenario, year = combination
+        data = rng.uniform(1, 365, size=(1, 6, 8)).astype("float32")
+        data[0, 0, 0] = np.nan
+        array = root.create_dataset(
+            f"chronic_heat/osc/v2/days_tas_above_{temperature}c_{gcm}_{scenario}_{year}"
+            "/indicator",
+            data=data,
+            chunks=(1, 4, 4),
+        )
+        array.attrs["crs"] = "EPSG:4326"
+        array.attrs["transform_mat3x3"] = [0.5, 0, -2, 0, -0.5, 3, 0, 0, 1]
+        arrays[combination] = data[0]
+    zarr.consolidate_metadata(root.store)
+    return arrays
+
+
+@pytest.fixture
+def source_store(tmp_path: Path) -> tuple[Path, dict]:
+    path = tmp_path / "source.zarr"
+    return path, _write_source_store(path)
+
+
+def test_parse_index_name() -> None:
+    index = _parse_index_name(
+        "chronic_heat/osc/v2/days_tas_above_27.5c_ACCESS-CM2_ssp585_2050/indicator"
+    )
+    assert index == (27.5, "ACCESS-CM2", "ssp585", datetime.datetime(2050, 1, 1))
+    assert index.time.year == 2050
+
+
+def test_parse_index_name_no_match() -> None:
+    with pytest.raises(ValueError):
+        _parse_index_name("chronic_heat/osc/v2/mean_degree_days")
+
+
+def test_indexes_to_coords() -> None:
+    indexes = [
+        _parse_index_name(f"days_tas_above_{temperature}c_{gcm}_ssp585_{year}")
+        for temperature in ["30", "25"]
+        for gcm in ["NorESM2-MM", "ACCESS-CM2"]
+        for year in [2050, 2030]
+    ]
+    coords = _indexes_to_coords(iter(indexes))
+    assert coords == {
+        "temperature": [25.0, 30.0],
+        "gcm": ["ACCESS-CM2", "NorESM2-MM"],
+        "scenario": ["ssp585"],
+        "time": [datetime.datetime(2030, 1, 1), datetime.datetime(2050, 1, 1)],
+    }
+
+
+def test_target_chunks() -> None:
+    # index dimensions are never split, spatial ones are tiled to the target size
+    assert _target_chunks((2, 2, 2, 1, 30, 40), 4, 50) == (2, 2, 2, 1, 30, 40)
+    assert _target_chunks((2, 2, 2, 1, 30, 40), 4, 0.01) == (2, 2, 2, 1, 18, 18)
+
+
+@pytest.mark.parametrize("split_years", [True, False])
+def test_cubify(
+    source_store: tuple[Path, dict], tmp_path: Path, split_years: bool
+) -> None:
+    pytest.importorskip("hazard")
+
+    store_path, arrays = source_store
+    output_paths = cubify(
+        store_path=store_path,
+        indicator_name="days_tas_above",
+        output_dir=tmp_path / "cubes",
+        split_years=split_years,
+        target_chunk_mb=0.001,
+        quantize=False,
+    )
+    assert list(output_paths) == (YEARS if split_years else YEARS[:1])
+
+    checked = set()
+    for output_path in output_paths.values():
+        with xr.open_zarr(output_path) as ds:
+            da = ds["days_tas_above"]
+            assert da.dims == (
+                "temperature",
+                "gcm",
+                "scenario",
+                "time",
+                "latitude",
+                "longitude",
+            )
+            for time in ds.indexes["time"]:
+                for temperature, gcm, scenario in itertools.product(
+                    TEMPERATURES, GCMS, SCENARIOS
+                ):
+                    combination = (temperature, gcm, scenario, time.year)
+                    values = da.sel(
+                        temperature=float(temperature),
+                        gcm=gcm,
+                        scenario=scenario,
+                        time=time,
+                    ).values
+                    if combination == MISSING:
+                        np.testing.assert_array_equal(values, 0)
+                    else:
+                        np.testing.assert_array_equal(values, arrays[combination])
+                    checked.add(combination)
+
+    assert checked == set(itertools.product(TEMPERATURES, GCMS, SCENARIOS, YEARS))
+
+
+def test_package_cubify() -> None:
+    # the implementation module is already imported here, which must not shadow
+    # the public function
+    import stactools.osc_hazard
+
+    assert stactools.osc_hazard.cubify is cubify
+
+
+def test_cubify_quantized(source_store: tuple[Path, dict], tmp_path: Path) -> None:
+    pytest.importorskip("hazard")
+
+    store_path, arrays = source_store
+    output_paths = cubify(
+        store_path=store_path,
+        indicator_name="days_tas_above",
+        output_dir=tmp_path / "cubes",
+        split_years=False,
+    )
+    with xr.open_zarr(output_paths[YEARS[0]]) as ds:
+        da = ds["days_tas_above"]
+        for (temperature, gcm, scenario, year), expected in arrays.items():
+            values = da.sel(
+                temperature=float(temperature),
+                gcm=gcm,
+                scenario=scenario,
+                time=datetime.datetime(year, 1, 1),
+            ).values
+            np.testing.assert_allclose(
+                values, expected, atol=SCALE_FACTORS["days_tas_above"] / 2 + 1e-4
+            )
+
+
+def test_cubify_quantized_overflow(tmp_path: Path) -> None:
+    pytest.importorskip("hazard")
+
+    # a single value out of the packed range, in the last year only, fails
+    # the whole conversion without leaving any of the yearly files behind
+    store_path = tmp_path / "source.zarr"
+    _write_source_store(store_path)
+    root = zarr.open_group(zarr.DirectoryStore(str(store_path)))
+    root["chronic_heat/osc/v2/days_tas_above_25c_ACCESS-CM2_ssp585_2050/indicator"][
+        0, 1, 1
+    ] = 20_000
+    with pytest.raises(ValueError, match="cannot be packed"):
+        cubify(
+            store_path=store_path,
+            indicator_name="days_tas_above",
+            output_dir=tmp_path / "cubes",
+        )
+    assert not list((tmp_path / "cubes").iterdir())
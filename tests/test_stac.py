@@ -1,4 +1,15 @@
+import datetime
+import functools
+import json
+
+import numpy as np
+import pytest
+import xarray as xr
+import xstac
+from pystac import Item
+
 from stactools.osc_hazard import stac
+from stactools.osc_hazard.constants import ATTRS
 
 from . import test_data
 
@@ -22,3 +33,102 @@ def test_create_item() -> None:
     assert item.id == "example-item"
     assert item.properties["custom_attribute"] == "foo"
     item.validate()
+
+
+def _cube(latitude: list[float], years: list[int]) -> xr.Dataset:
+    # small in-memory dataset with the layout of the cubes written by cubify
+    coords = {
+        "temperature": [25.0, 30.0],
+        "gcm": ["ACCESS-CM2", "NorESM2-MM"],
+        "scenario": ["ssp585"],
+        "time": [datetime.datetime(year, 1, 1) for year in years],
+        "latitude": latitude,
+        "longitude": [0.0, 0.5, 1.0, 1.5],
+    }
+    ds = xr.Dataset(
+        {
+            "days_tas_above": (
+                list(coords),
+                np.zeros([len(values) for values in coords.values()], "float32"),
+            )
+        },
+        coords=coords,
+    )
+    for name, attrs in ATTRS["days_tas_above"].items():
+        ds[name].attrs = dict(attrs)
+    return ds.chunk({"latitude": 2, "longitude": 2})
+
+
+def _item() -> Item:
+    return Item(
+        id="cube",
+        geometry=None,
+        bbox=None,
+        datetime=datetime.datetime(2030, 1, 1),
+        properties={},
+    )
+
+
+def _xarray_to_stac(ds: xr.Dataset, stac_object: Item) -> Item:
+    return xstac.xarray_to_stac(
+        ds,
+        stac_object,
+        reference_system=stac.REFERENCE_SYSTEM,
+        temporal_dimension="time",
+        x_dimension="longitude",
+        y_dimension="latitude",
+        validate=False,
+    )
+
+
+def _serialized(properties: dict) -> dict:
+    # as written to JSON, where tuples and lists are the same
+    return json.loads(json.dumps(properties))
+
+
+@pytest.mark.parametrize(
+    "latitude",
+    [[50.0, 50.5, 51.0], [51.0, 50.5, 50.0]],
+    ids=["ascending", "descending"],
+)
+@pytest.mark.parametrize(
+    "years",
+    [[2030, 2040, 2050], [2030, 2040, 2060], [2030, 2031, 2032]],
+    ids=["regular", "irregular", "leap-year"],
+)
+def test_add_datacube_extension(latitude: list[float], years: list[int]) -> None:
+    # the extension built directly for our cubes must match what xstac builds
+    ds = _cube(latitude, years)
+    item = stac._add_datacube_extension(_item(), ds)
+    expected = _xarray_to_stac(ds, _item())
+    assert _serialized(item.properties) == _serialized(expected.properties)
+    assert item.stac_extensions == expected.stac_extensions
+
+
+def test_add_datacube_extension_fallback(monkeypatch: pytest.MonkeyPatch) -> None:
+    # datasets with other dimensions are described by xstac
+    ds = _cube([50.0, 50.5, 51.0], [2030, 2040, 2050]).isel(gcm=0)
+    expected = _xarray_to_stac(ds, _item())
+    monkeypatch.setattr(
+        stac.xstac,
+        "xarray_to_stac",
+        functools.partial(xstac.xarray_to_stac, validate=False),
+    )
+    item = stac._add_datacube_extension(_item(), ds)
+    assert _serialized(item.properties) == _serialized(expected.properties)
+
+
+@pytest.mark.parametrize(
+    "latitude",
+    [[50.0, 50.5, 51.0], [51.0, 50.5, 50.0]],
+    ids=["ascending", "descending"],
+)
+def test_get_bbox(latitude: list[float]) -> None:
+    ds = _cube(latitude, [2030])
+    assert stac._get_bbox(ds) == [0.0, 50.0, 1.5, 51.0]
+
+
+def test_get_bbox_not_monotonic() -> None:
+    ds = _cube([50.0, 51.0, 50.5], [2030])
+    with pytest.raises(ValueError, match="'latitude' is not monotonic"):
+        stac._get_bbox(ds)